@@ -2,16 +2,16 @@
 """Generate hero background image for IWT website"""
 
 import os
-import base64
-import json
-import urllib.request
+import sys
+import asyncio
 from pathlib import Path
 
+from iwt_gemini import Client
+
 API_KEY = os.environ.get('GEMINI_API_KEY')
 MODEL = 'gemini-2.0-flash-exp'
 
 images_dir = Path(__file__).parent / 'images'
-images_dir.mkdir(exist_ok=True)
 
 prompt = """
 Create a wide, abstract illustration representing waste-to-energy transformation for a company website hero section.
@@ -35,38 +35,13 @@ Style requirements:
 This is for a professional B2B company website. The image should convey transformation, sustainability, and technology without being literal or cartoonish. Think abstract data visualization meets energy flow diagram.
 """
 
-def generate_image():
-    url = f'https://generativelanguage.googleapis.com/v1beta/models/{MODEL}:generateContent?key={API_KEY}'
-
-    request_body = {
-        'contents': [{
-            'parts': [{
-                'text': prompt
-            }]
-        }],
-        'generationConfig': {
-            'responseModalities': ['TEXT', 'IMAGE']
-        }
-    }
-
-    data = json.dumps(request_body).encode('utf-8')
-    req = urllib.request.Request(url, data=data, headers={'Content-Type': 'application/json'})
-
-    print('Generating hero background...')
-    with urllib.request.urlopen(req, timeout=60) as response:
-        result = json.loads(response.read().decode('utf-8'))
 
-        for candidate in result.get('candidates', []):
-            for part in candidate.get('content', {}).get('parts', []):
-                if 'inlineData' in part:
-                    ext = 'png' if 'png' in part['inlineData']['mimeType'] else 'jpg'
-                    filename = images_dir / f'hero-bg.{ext}'
-                    image_bytes = base64.b64decode(part['inlineData']['data'])
-                    filename.write_bytes(image_bytes)
-                    print(f'Saved: {filename}')
-                    return
+async def main():
+    async with Client(API_KEY, MODEL, images_dir, force='--force' in sys.argv) as client:
+        client.preflight([{'name': 'hero-bg', 'prompt': prompt}])
+        if await client.generate('hero-bg', prompt) is None:
+            print('No image generated')
 
-    print('No image generated')
 
 if __name__ == '__main__':
-    generate_image()
+    asyncio.run(main())
@@ -8,13 +8,12 @@ Usage:
 """
 
 import os
-import base64
-import json
-import time
-import urllib.request
-import urllib.error
+import sys
+import asyncio
 from pathlib import Path
 
+from iwt_gemini import Client
+
 API_KEY = os.environ.get('GEMINI_API_KEY')
 MODEL = 'gemini-2.0-flash-exp'
 
@@ -24,9 +23,7 @@ if not API_KEY:
     print('Then run: export GEMINI_API_KEY="your-key-here"')
     exit(1)
 
-# Create images directory
 images_dir = Path(__file__).parent / 'images'
-images_dir.mkdir(exist_ok=True)
 
 # Style guide for consistent isometric flat-color images
 style_guide = """
@@ -87,83 +84,13 @@ image_prompts = [
 ]
 
 
-def generate_image(prompt):
-    """Generate an image using Gemini API"""
-    url = f'https://generativelanguage.googleapis.com/v1beta/models/{MODEL}:generateContent?key={API_KEY}'
-
-    request_body = {
-        'contents': [{
-            'parts': [{
-                'text': prompt
-            }]
-        }],
-        'generationConfig': {
-            'responseModalities': ['TEXT', 'IMAGE']
-        }
-    }
-
-    data = json.dumps(request_body).encode('utf-8')
-    req = urllib.request.Request(
-        url,
-        data=data,
-        headers={'Content-Type': 'application/json'}
-    )
-
-    try:
-        with urllib.request.urlopen(req, timeout=60) as response:
-            result = json.loads(response.read().decode('utf-8'))
-
-            if 'error' in result:
-                raise Exception(result['error'].get('message', 'Unknown error'))
-
-            # Extract image from response
-            candidates = result.get('candidates', [])
-            for candidate in candidates:
-                parts = candidate.get('content', {}).get('parts', [])
-                for part in parts:
-                    if 'inlineData' in part:
-                        return {
-                            'mimeType': part['inlineData']['mimeType'],
-                            'data': part['inlineData']['data']
-                        }
-
-            raise Exception('No image in response')
-
-    except urllib.error.HTTPError as e:
-        error_body = e.read().decode('utf-8')
-        raise Exception(f'HTTP {e.code}: {error_body}')
-
-
-def save_image(name, image_data):
-    """Save base64 image to file"""
-    ext = 'png' if 'png' in image_data['mimeType'] else 'jpg'
-    filename = images_dir / f'{name}.{ext}'
-
-    image_bytes = base64.b64decode(image_data['data'])
-    filename.write_bytes(image_bytes)
-
-    print(f'  Saved: {filename}')
-    return filename
-
-
-def main():
+async def main():
     print('Starting IWT image generation...\n')
     print(f'Generating {len(image_prompts)} images in isometric flat-color style\n')
 
-    successful = 0
-    failed = 0
-
-    for img in image_prompts:
-        print(f'Generating: {img["name"]}...')
-        try:
-            image_data = generate_image(img['prompt'])
-            save_image(img['name'], image_data)
-            successful += 1
-            # Rate limiting - wait 3 seconds between requests
-            time.sleep(3)
-        except Exception as e:
-            print(f'  Failed: {e}')
-            failed += 1
+    async with Client(API_KEY, MODEL, images_dir, force='--force' in sys.argv) as client:
+        client.preflight(image_prompts)
+        successful, failed = await client.generate_batch(image_prompts)
 
     print(f'\nImage generation complete!')
     print(f'  Successful: {successful}')
@@ -172,4 +99,4 @@ def main():
 
 
 if __name__ == '__main__':
-    main()
+    asyncio.run(main())
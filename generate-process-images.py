@@ -2,13 +2,12 @@
 """Generate process step images for IWT science section flipbook"""
 
 import os
-import base64
-import json
-import time
-import urllib.request
-import urllib.error
+import sys
+import asyncio
 from pathlib import Path
 
+from iwt_gemini import Client
+
 API_KEY = os.environ.get('GEMINI_API_KEY')
 MODEL = 'gemini-2.0-flash-exp'
 
@@ -17,7 +16,6 @@ if not API_KEY:
     exit(1)
 
 images_dir = Path(__file__).parent / 'images'
-images_dir.mkdir(exist_ok=True)
 
 # Consistent style for all process images
 style_guide = """
@@ -98,106 +96,24 @@ Power transmission tower in background.
 ]
 
 
-def generate_image(prompt, previous_image=None):
-    """Generate an image using Gemini API, optionally using previous image for continuity"""
-    url = f'https://generativelanguage.googleapis.com/v1beta/models/{MODEL}:generateContent?key={API_KEY}'
-
-    # Build parts list
-    parts = []
-
-    if previous_image:
-        # Include previous image for visual continuity
-        parts.append({
-            'text': 'Here is the previous frame in our process sequence. Generate the next frame maintaining the same visual style, perspective, and color palette:'
-        })
-        parts.append({
-            'inlineData': {
-                'mimeType': previous_image['mimeType'],
-                'data': previous_image['data']
-            }
-        })
-        parts.append({
-            'text': f'Now generate the next frame:\n\n{prompt}'
-        })
-    else:
-        parts.append({
-            'text': prompt
-        })
-
-    request_body = {
-        'contents': [{
-            'parts': parts
-        }],
-        'generationConfig': {
-            'responseModalities': ['TEXT', 'IMAGE']
-        }
-    }
-
-    data = json.dumps(request_body).encode('utf-8')
-    req = urllib.request.Request(
-        url,
-        data=data,
-        headers={'Content-Type': 'application/json'}
-    )
-
-    try:
-        with urllib.request.urlopen(req, timeout=90) as response:
-            result = json.loads(response.read().decode('utf-8'))
-
-            if 'error' in result:
-                raise Exception(result['error'].get('message', 'Unknown error'))
-
-            candidates = result.get('candidates', [])
-            for candidate in candidates:
-                parts = candidate.get('content', {}).get('parts', [])
-                for part in parts:
-                    if 'inlineData' in part:
-                        return {
-                            'mimeType': part['inlineData']['mimeType'],
-                            'data': part['inlineData']['data']
-                        }
-
-            raise Exception('No image in response')
-
-    except urllib.error.HTTPError as e:
-        error_body = e.read().decode('utf-8')
-        raise Exception(f'HTTP {e.code}: {error_body}')
-
-
-def save_image(name, image_data):
-    """Save base64 image to file"""
-    ext = 'png' if 'png' in image_data['mimeType'] else 'jpg'
-    filename = images_dir / f'{name}.{ext}'
-
-    image_bytes = base64.b64decode(image_data['data'])
-    filename.write_bytes(image_bytes)
-
-    print(f'  Saved: {filename}')
-    return filename
-
-
-def main():
+async def main():
     print('Generating process step images for science section flipbook...\n')
-    print('Each image will be fed into the next for visual continuity.\n')
-
-    successful = 0
-    failed = 0
-    previous_image = None
-
-    for i, step in enumerate(process_steps):
-        print(f'Generating: {step["name"]} (step {i+1}/6)...')
-        try:
-            image_data = generate_image(step['prompt'], previous_image)
-            save_image(step['name'], image_data)
-            previous_image = image_data  # Chain to next image
-            successful += 1
-            # Rate limiting
-            time.sleep(3)
-        except Exception as e:
-            print(f'  Failed: {e}')
-            failed += 1
-            # Continue with no previous image if one fails
-            previous_image = None
+    print('Step 1 seeds the visual style; the remaining steps fan out in parallel against it.\n')
+
+    async with Client(API_KEY, MODEL, images_dir, timeout=90,
+                      force='--force' in sys.argv) as client:
+        client.preflight(process_steps)
+        # Generate the seed frame first, then condition every other step on
+        # it - continuity comes from the shared seed + style guide, without
+        # forcing the whole pipeline to run serially
+        first = process_steps[0]
+        seed_image = await client.generate(first['name'], first['prompt'])
+        successful, failed = await client.generate_batch(process_steps[1:], seed=seed_image)
+
+    if seed_image is not None:
+        successful += 1
+    else:
+        failed += 1
 
     print(f'\nGeneration complete!')
     print(f'  Successful: {successful}')
@@ -205,4 +121,4 @@ def main():
 
 
 if __name__ == '__main__':
-    main()
+    asyncio.run(main())
@@ -0,0 +1,347 @@
+"""Shared Gemini image client for the IWT generation scripts.
+
+Houses the single hot path - pooled session, pre-encoded bodies, retry
+with backoff, prompt-hash caching, and streaming saves - so the three
+generation scripts stay thin prompt lists.
+"""
+
+import os
+import base64
+import random
+import hashlib
+import asyncio
+from pathlib import Path
+from collections import deque
+
+import aiohttp
+import orjson
+
+# Transient statuses retried with exponential backoff + jitter
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+MAX_RETRIES = 5
+BACKOFF_FACTOR = 1.5
+
+# Max requests in flight at once - bounds memory held by in-flight responses
+MAX_CONCURRENT = 3
+
+# Requests-per-minute quota for the image model; the token bucket lets
+# calls burst up to the quota and only blocks once it is spent
+MAX_RATE = 10
+RATE_PERIOD = 60
+
+# Base64 slice size for streaming decode - must stay a multiple of 4
+B64_CHUNK = 1 << 16
+
+JSON_HEADERS = {'Content-Type': 'application/json'}
+
+# Prompts beyond this are rejected up front instead of burning a quota call
+MAX_PROMPT_CHARS = 30000
+
+CONTINUITY_PREAMBLE = (
+    'Here is the previous frame in our process sequence. Generate the next '
+    'frame maintaining the same visual style, perspective, and color palette:'
+)
+
+
+class GenerationTimeout(Exception):
+    """Raised when the API did not respond within the configured timeouts"""
+
+
+class RateLimiter:
+    """Token-bucket limiter: bursts up to max_rate calls per time_period,
+    blocking only when the quota is actually spent"""
+
+    def __init__(self, max_rate, time_period):
+        self.max_rate = max_rate
+        self.time_period = time_period
+        self._starts = deque()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            loop = asyncio.get_running_loop()
+            while True:
+                now = loop.time()
+                while self._starts and now - self._starts[0] >= self.time_period:
+                    self._starts.popleft()
+                if len(self._starts) < self.max_rate:
+                    self._starts.append(now)
+                    return
+                # Oldest token expires first - sleep until it does
+                await asyncio.sleep(self.time_period - (now - self._starts[0]))
+
+
+class Client:
+    """Async Gemini image client; use as an async context manager"""
+
+    def __init__(self, api_key, model, images_dir, timeout=60,
+                 max_concurrent=MAX_CONCURRENT, max_rate=MAX_RATE,
+                 rate_period=RATE_PERIOD, force=False):
+        self.api_key = api_key
+        self.model = model
+        self.images_dir = Path(images_dir)
+        self.images_dir.mkdir(exist_ok=True)
+        self.url = (
+            'https://generativelanguage.googleapis.com/v1beta/models/'
+            f'{model}:generateContent?key={api_key}'
+        )
+        self.timeout = aiohttp.ClientTimeout(connect=5, total=timeout)
+        self.max_concurrent = max_concurrent
+        self.force = force
+        self._limiter = RateLimiter(max_rate, rate_period)
+        self._session = None
+        self._pending_saves = []
+
+    async def __aenter__(self):
+        # One pooled session for the whole run - the keep-alive connection
+        # stays warm instead of paying a fresh TLS handshake per image
+        self._session = aiohttp.ClientSession()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        try:
+            await self.flush_saves()
+        finally:
+            await self._session.close()
+
+    def preflight(self, prompts):
+        """Validate credentials, output dir, and prompts before spending any quota.
+
+        A bad key, unwritable images dir, or oversized prompt fails here in
+        milliseconds instead of after several successful API calls.
+        """
+        if not self.api_key or len(self.api_key) < 20:
+            raise ValueError('GEMINI_API_KEY is missing or malformed')
+
+        # Probe writability so permission problems surface before the first save
+        probe = self.images_dir / '.wtest'
+        probe.write_bytes(b'')
+        probe.unlink()
+
+        for p in prompts:
+            if len(p['prompt']) >= MAX_PROMPT_CHARS:
+                raise ValueError(
+                    f'Prompt for {p["name"]} is {len(p["prompt"])} characters; '
+                    f'limit is {MAX_PROMPT_CHARS}'
+                )
+
+    # --- caching -----------------------------------------------------------
+
+    def cache_key(self, prompt):
+        """Content hash identifying this model + prompt combination"""
+        return hashlib.sha256(f'{self.model}\0{prompt}'.encode('utf-8')).hexdigest()
+
+    def find_cached(self, name, key):
+        """Return an existing image file generated from the same model + prompt, or None"""
+        sidecar = self.images_dir / f'{name}.sha256'
+        if not sidecar.exists() or sidecar.read_text().strip() != key:
+            return None
+        for ext in ('png', 'jpg'):
+            filename = self.images_dir / f'{name}.{ext}'
+            if filename.exists():
+                return filename
+        return None
+
+    def load_cached(self, filename):
+        """Re-read a saved image so it can seed another generation"""
+        mime = 'image/png' if filename.suffix == '.png' else 'image/jpeg'
+        return {
+            'mimeType': mime,
+            'data': base64.b64encode(filename.read_bytes()).decode('ascii')
+        }
+
+    # --- request plumbing --------------------------------------------------
+
+    def _encode_request(self, prompt, seed):
+        """Serialize a generateContent request body to bytes"""
+        if seed:
+            parts = [
+                {'text': CONTINUITY_PREAMBLE},
+                {'inlineData': {'mimeType': seed['mimeType'], 'data': seed['data']}},
+                {'text': f'Now generate the next frame:\n\n{prompt}'},
+            ]
+        else:
+            parts = [{'text': prompt}]
+        return orjson.dumps({
+            'contents': [{'parts': parts}],
+            'generationConfig': {
+                'responseModalities': ['TEXT', 'IMAGE']
+            }
+        })
+
+    async def _post_with_retry(self, body):
+        """POST a pre-encoded body, retrying transient errors with exponential backoff + jitter"""
+        for attempt in range(MAX_RETRIES + 1):
+            # Every attempt spends quota, so every attempt takes a token
+            await self._limiter.acquire()
+            try:
+                async with self._session.post(
+                    self.url, data=body, headers=JSON_HEADERS, timeout=self.timeout
+                ) as response:
+                    if response.status in RETRY_STATUSES and attempt < MAX_RETRIES:
+                        retry_after = response.headers.get('Retry-After')
+                        if retry_after and retry_after.isdigit():
+                            delay = int(retry_after)
+                        else:
+                            delay = BACKOFF_FACTOR * (2 ** attempt) + random.uniform(0, 1)
+                        print(f'  HTTP {response.status}, retrying in {delay:.1f}s...')
+                        await asyncio.sleep(delay)
+                        continue
+                    if response.status != 200:
+                        error_body = await response.text()
+                        raise Exception(f'HTTP {response.status}: {error_body}')
+                    # Parse the raw bytes with orjson - skips the intermediate
+                    # utf-8 str copy of the multi-MB base64 payload
+                    return orjson.loads(await response.read())
+            except asyncio.TimeoutError:
+                raise GenerationTimeout(
+                    f'API request timed out (connect {self.timeout.connect}s, '
+                    f'total {self.timeout.total}s)'
+                ) from None
+
+    async def _fetch(self, prompt, seed=None):
+        """Call the API and return the generated image reference"""
+        result = await self._post_with_retry(self._encode_request(prompt, seed))
+
+        if 'error' in result:
+            raise Exception(result['error'].get('message', 'Unknown error'))
+
+        # Prefer a fileData URI (raw bytes, no 33% base64 bloat) and fall
+        # back to inline base64 data
+        inline = None
+        for candidate in result.get('candidates', []):
+            for part in candidate.get('content', {}).get('parts', []):
+                if 'fileData' in part:
+                    return {
+                        'mimeType': part['fileData'].get('mimeType', 'image/png'),
+                        'uri': part['fileData']['fileUri']
+                    }
+                if 'inlineData' in part and inline is None:
+                    inline = {
+                        'mimeType': part['inlineData']['mimeType'],
+                        'data': part['inlineData']['data']
+                    }
+
+        if inline:
+            return inline
+
+        raise Exception('No image in response')
+
+    # --- saving ------------------------------------------------------------
+
+    def save(self, name, image_data):
+        """Save inline base64 image data to file via streaming decode"""
+        ext = 'png' if 'png' in image_data['mimeType'] else 'jpg'
+        filename = self.images_dir / f'{name}.{ext}'
+
+        data = image_data['data']
+
+        # The decoded size is known exactly from the base64 length, so
+        # pre-allocate it and let the filesystem pick one contiguous extent
+        size = len(data) * 3 // 4
+        if data.endswith('=='):
+            size -= 2
+        elif data.endswith('='):
+            size -= 1
+
+        fd = os.open(filename, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            if size and hasattr(os, 'posix_fallocate'):
+                os.posix_fallocate(fd, 0, size)
+            fp = os.fdopen(fd, 'wb', buffering=1 << 20)
+        except Exception:
+            os.close(fd)
+            raise
+
+        # Decode straight into the file's write buffer in 64 KB slices instead
+        # of materializing the whole decoded image in memory first
+        with fp:
+            for i in range(0, len(data), B64_CHUNK):
+                fp.write(base64.b64decode(data[i:i + B64_CHUNK]))
+
+        print(f'  Saved: {filename}')
+        return filename
+
+    async def _download(self, name, image_data):
+        """Stream the generated asset from its fileData URI straight to disk"""
+        ext = 'png' if 'png' in image_data['mimeType'] else 'jpg'
+        filename = self.images_dir / f'{name}.{ext}'
+
+        async with self._session.get(image_data['uri'], timeout=self.timeout) as response:
+            if response.status != 200:
+                raise Exception(f'HTTP {response.status} fetching generated image')
+            with open(filename, 'wb', buffering=1 << 20) as fp:
+                async for chunk in response.content.iter_chunked(B64_CHUNK):
+                    fp.write(chunk)
+
+        print(f'  Saved: {filename}')
+        return filename
+
+    # --- public entry points -----------------------------------------------
+
+    async def generate(self, name, prompt, seed=None):
+        """Generate and save one image; returns the frame data for seeding, or None on failure"""
+        key = self.cache_key(prompt)
+
+        # Skip the API call if this prompt already produced this image,
+        # but keep the cached frame available for seeding
+        if not self.force:
+            cached = self.find_cached(name, key)
+            if cached:
+                print(f'Cached: {name} ({cached.name})')
+                return self.load_cached(cached)
+
+        print(f'Generating: {name}...')
+        try:
+            image_data = await self._fetch(prompt, seed)
+            if 'uri' in image_data:
+                filename = await self._download(name, image_data)
+                # Re-read the downloaded file so it can seed other frames
+                image_data = self.load_cached(filename)
+                (self.images_dir / f'{name}.sha256').write_text(key)
+            else:
+                # Decode + write happen in the background so the next request
+                # isn't waiting on this one's save; flush_saves collects errors
+                self._pending_saves.append(
+                    asyncio.create_task(self._save_and_mark(name, image_data, key))
+                )
+            return image_data
+        except Exception as e:
+            print(f'  Failed: {e}')
+            return None
+
+    async def _save_and_mark(self, name, image_data, key):
+        """Background save: stream the decode off the event loop, then mark the cache"""
+        await asyncio.to_thread(self.save, name, image_data)
+        (self.images_dir / f'{name}.sha256').write_text(key)
+
+    async def flush_saves(self):
+        """Wait for outstanding background saves; returns the number that failed"""
+        pending, self._pending_saves = self._pending_saves, []
+        failures = 0
+        for result in await asyncio.gather(*pending, return_exceptions=True):
+            if isinstance(result, Exception):
+                print(f'  Save failed: {result}')
+                failures += 1
+        return failures
+
+    async def generate_batch(self, prompts, seed=None):
+        """Generate many images concurrently; returns (successful, failed) counts"""
+        semaphore = asyncio.Semaphore(self.max_concurrent)
+
+        async def bounded(p):
+            # Cache hits don't touch the API, so don't queue them behind in-flight calls
+            if not self.force and self.find_cached(p['name'], self.cache_key(p['prompt'])):
+                return await self.generate(p['name'], p['prompt'], seed)
+            # Rate pacing happens in the token bucket; the semaphore only
+            # bounds how many responses are in flight at once
+            async with semaphore:
+                return await self.generate(p['name'], p['prompt'], seed)
+
+        results = await asyncio.gather(*(bounded(p) for p in prompts))
+        generated = sum(1 for r in results if r is not None)
+
+        # Surface background save errors before reporting the counts
+        save_failures = await self.flush_saves()
+        successful = generated - save_failures
+        return successful, len(results) - successful